@@ -1,6 +1,12 @@
+from collections import OrderedDict
 from types import SimpleNamespace
 import numpy as np
-from scipy.optimize import minimize_scalar, minimize
+from scipy.optimize import OptimizeResult, brentq, minimize
+
+def _clearing_price(alpha, beta, w1A, w2A, p2):
+    # Walrasian price of good 1 solving alpha*(w1A*p1 + w2A*p2) + beta*((1-w1A)*p1 + (1-w2A)*p2) = p1
+    # Works elementwise, so endowments may be broadcast arrays
+    return (alpha * w2A + beta * (1 - w2A)) / ((1 - alpha) * w1A + (1 - beta) * (1 - w1A)) * p2
 
 class ExchangeEconomyClass:
     def __init__(self, w1A=0.8, w2A=0.3):
@@ -10,6 +16,9 @@ class ExchangeEconomyClass:
         # w1A, w2A: Initial endowments of goods 1 and 2 for consumer A
         # p2: Price of good 2, set as the numeraire (fixed to 1)
         self.par = SimpleNamespace(alpha=1/3, beta=2/3, w1A=w1A, w2A=w2A, p2=1)
+        # SLSQP bookkeeping: last solution per problem (warm starts) and results per parameter set
+        self._last_x = {}
+        self._slsqp_results = OrderedDict()
 
     def utility_A(self, x1A, x2A):
         # Utility function for consumer A using Cobb-Douglas form
@@ -19,20 +28,32 @@ class ExchangeEconomyClass:
         # Utility function for consumer B using Cobb-Douglas form
         return (x1B ** self.par.beta) * (x2B ** (1 - self.par.beta))
 
+    def utility_A_gradient(self, x1A, x2A):
+        # Analytic gradient of consumer A's Cobb-Douglas utility with respect to (x1A, x2A)
+        u = self.utility_A(x1A, x2A)
+        return np.array([self.par.alpha * u / x1A, (1 - self.par.alpha) * u / x2A])
+
+    def utility_B_gradient(self, x1B, x2B):
+        # Analytic gradient of consumer B's Cobb-Douglas utility with respect to (x1B, x2B)
+        u = self.utility_B(x1B, x2B)
+        return np.array([self.par.beta * u / x1B, (1 - self.par.beta) * u / x2B])
+
     def demand_A(self, p1):
         # Demand function for consumer A deriving from the utility maximization
         # subject to the budget constraint with prices p1 for good 1 and self.par.p2 for good 2
-        income_A = self.par.w1A * p1 + self.par.w2A * self.par.p2
-        x1A_star = self.par.alpha * (income_A / p1)
-        x2A_star = (1 - self.par.alpha) * (income_A / self.par.p2)
+        par = self.par
+        income_A = par.w1A * p1 + par.w2A * par.p2
+        x1A_star = par.alpha * (income_A / p1)
+        x2A_star = (1 - par.alpha) * (income_A / par.p2)
         return x1A_star, x2A_star
 
     def demand_B(self, p1):
         # Demand function for consumer B deriving from the utility maximization
         # subject to the budget constraint with prices p1 for good 1 and self.par.p2 for good 2
-        income_B = (1 - self.par.w1A) * p1 + (1 - self.par.w2A) * self.par.p2
-        x1B_star = self.par.beta * (income_B / p1)
-        x2B_star = (1 - self.par.beta) * (income_B / self.par.p2)
+        par = self.par
+        income_B = (1 - par.w1A) * p1 + (1 - par.w2A) * par.p2
+        x1B_star = par.beta * (income_B / p1)
+        x2B_star = (1 - par.beta) * (income_B / par.p2)
         return x1B_star, x2B_star
 
     def market_clearing_error(self, p1):
@@ -45,62 +66,68 @@ class ExchangeEconomyClass:
         eps2 = abs(x2A_star + x2B_star - 1)  # Total excess demand for good 2
         return eps1 + eps2  # Combined error for both goods
 
+    def market_clearing_residual(self, p1):
+        # Signed excess demand for good 1 at price p1
+        # By Walras' law the market for good 2 clears whenever this residual is zero
+        x1A_star, _ = self.demand_A(p1)
+        x1B_star, _ = self.demand_B(p1)
+        return x1A_star + x1B_star - 1
+
     def find_market_clearing_price(self):
-        # Function to find the market-clearing price for good 1 using a numerical solver
-        # The solver minimizes the market clearing error
-        result = minimize_scalar(self.market_clearing_error, bounds=(0.01, 10), method='bounded')
-        if result.success:
-            return result.x
-        else:
+        # Function to find the market-clearing price for good 1
+        # With the Cobb-Douglas demands of this class the price has a closed form
+        if (type(self).demand_A is ExchangeEconomyClass.demand_A
+                and type(self).demand_B is ExchangeEconomyClass.demand_B):
+            par = self.par
+            return _clearing_price(par.alpha, par.beta, par.w1A, par.w2A, par.p2)
+
+        # Fallback for subclasses with other demands: find the root of the excess demand for good 1
+        try:
+            return brentq(self.market_clearing_residual, 0.01, 10, xtol=1e-10)
+        except (ValueError, RuntimeError):
+            # No sign change on the bracket, or no convergence
             raise ValueError("Optimization failed to find a market-clearing price.")
 
-    def maximize_consumer_A_utility_discrete(self, P1):
-        # Function to maximize consumer A's utility over a discrete set of prices for good 1
-        # Iterates over each price, calculates utility, and keeps track of the maximum
-        max_utility = float('-inf')
-        optimal_price = None
-        optimal_allocation_A = None
-        for p1 in P1:
-            # Calculate utility at each price
-            x1B_star, x2B_star = self.demand_B(p1)
-            x1A_star, x2A_star = 1 - x1B_star, 1 - x2B_star
-            utility_A = self.utility_A(x1A_star, x2A_star)
-            # Update maximum utility and corresponding price and allocation
-            if utility_A > max_utility:
-                max_utility = utility_A
-                optimal_price = p1
-                optimal_allocation_A = (x1A_star, x2A_star)
-        return optimal_price, optimal_allocation_A, max_utility
+    @staticmethod
+    def equilibrium_grid(w1A_arr, w2A_arr, alpha=1/3, beta=2/3, p2=1):
+        """Market-clearing prices and allocations for every combination of endowments in w1A_arr and w2A_arr.
 
-    def maximize_consumer_A_utility_continuous(self):
-        # Function to maximize consumer A's utility for any positive price of good 1
-        # Uses a numerical solver to maximize the utility as a continuous function of price
-        result = minimize(lambda p1: -self.utility_A(*(1 - np.array(self.demand_B(p1[0])))), x0=[1], bounds=[(0.01, None)], method='L-BFGS-B')
-        if result.success:
-            optimal_price = result.x[0]
-            optimal_allocation_A = (1 - np.array(self.demand_B(optimal_price)))
-            return optimal_price, optimal_allocation_A, -result.fun
-        else:
-            raise ValueError("Optimization failed to maximize consumer A's utility.")
+        Uses the Cobb-Douglas closed forms of this class, so it does not reflect demands overridden in subclasses.
+        """
+        # Broadcast endowments to a (len(w1A_arr), len(w2A_arr)) grid and evaluate the closed forms once
+        # Scalars are treated as one-element arrays
+        w1A = np.atleast_1d(np.asarray(w1A_arr, dtype=float))[:, None]
+        w2A = np.atleast_1d(np.asarray(w2A_arr, dtype=float))[None, :]
+        p1 = _clearing_price(alpha, beta, w1A, w2A, p2)
+        income_A = w1A * p1 + w2A * p2
+        income_B = (1 - w1A) * p1 + (1 - w2A) * p2
+        x1A_star, x2A_star = alpha * (income_A / p1), (1 - alpha) * (income_A / p2)
+        x1B_star, x2B_star = beta * (income_B / p1), (1 - beta) * (income_B / p2)
+        return p1, (x1A_star, x2A_star), (x1B_star, x2B_star)
 
     def maximize_consumer_A_utility_discrete(self, P1):
         """Maximize consumer A's utility over a discrete set of prices P1."""
-        max_utility = float('-inf')
-        optimal_price = None
-        optimal_allocation_A = None
-        for p1 in P1:
-            x1B_star, x2B_star = self.demand_B(p1)
-            x1A_star, x2A_star = 1 - x1B_star, 1 - x2B_star
-            utility_A = self.utility_A(x1A_star, x2A_star)
-            if utility_A > max_utility:
-                max_utility = utility_A
-                optimal_price = p1
-                optimal_allocation_A = (x1A_star, x2A_star)
-        return optimal_price, optimal_allocation_A, max_utility
+        # Evaluate B's demand and A's utility for the whole price grid at once
+        P1 = np.asarray(P1, dtype=float)
+        x1B_star, x2B_star = self.demand_B(P1)
+        x1A_star, x2A_star = 1 - x1B_star, 1 - x2B_star
+        with np.errstate(invalid='ignore'):
+            utility_A = x1A_star ** self.par.alpha * x2A_star ** (1 - self.par.alpha)
+        # Like the original loop, return no price if the grid is empty or every price is infeasible
+        if np.all(np.isnan(utility_A)):
+            return None, None, float('-inf')
+        # nanargmax skips infeasible prices (negative allocations give nan utility)
+        i = np.nanargmax(utility_A)
+        return P1[i], (x1A_star[i], x2A_star[i]), utility_A[i]
 
     def maximize_consumer_A_utility_continuous(self):
         """Maximize consumer A's utility over a continuous range of prices."""
-        result = minimize(lambda p1: -self.utility_A(*(1 - np.array(self.demand_B(p1[0])))), x0=[1], bounds=[(0.01, None)], method='L-BFGS-B')
+        def objective(p1):
+            # A consumes what B does not demand; plain floats avoid building an array per evaluation
+            x1B_star, x2B_star = self.demand_B(p1[0])
+            return -self.utility_A(1.0 - x1B_star, 1.0 - x2B_star)
+
+        result = minimize(objective, x0=[1], bounds=[(0.01, None)], method='L-BFGS-B')
         if result.success:
             optimal_price = result.x[0]
             optimal_allocation_A = (1 - np.array(self.demand_B(optimal_price)))
@@ -108,26 +135,59 @@ class ExchangeEconomyClass:
         else:
             raise ValueError("Optimization failed to maximize consumer A's utility.")
             
+    # Number of SLSQP results kept per instance before the least recently used is dropped
+    slsqp_cache_size = 128
+
+    def _solve_slsqp(self, name, objective, jac, bounds, constraints=()):
+        # Shared SLSQP driver for the allocation problems below
+        # Results are memoized per parameter set, and a new parameter set is warm-started
+        # from the previous solution of the same problem when that point is still feasible
+        par = self.par
+        key = (name, par.alpha, par.beta, par.w1A, par.w2A)
+        if key in self._slsqp_results:
+            self._slsqp_results.move_to_end(key)
+            result = self._slsqp_results[key]
+        else:
+            if isinstance(constraints, dict):
+                constraints = [constraints]
+            x0 = [par.w1A, par.w2A]
+            last_x = self._last_x.get(name)
+            # An infeasible warm start can leave SLSQP stuck at a worse point that it still reports as a success
+            if last_x is not None and all(con['fun'](last_x) >= 0 for con in constraints):
+                x0 = last_x
+            result = minimize(objective, x0, method='SLSQP', jac=jac, bounds=bounds, constraints=constraints,
+                              options={'ftol': 1e-8})
+            if result.success:
+                self._last_x[name] = result.x.copy()
+                self._slsqp_results[key] = result
+                if len(self._slsqp_results) > self.slsqp_cache_size:
+                    self._slsqp_results.popitem(last=False)
+        # Hand out a copy so callers modifying result.x cannot corrupt the cache
+        return OptimizeResult(result, x=result.x.copy())
+
     def optimize_allocation_pareto_improvement(self):
         """Optimize allocation to maximize A's utility with Pareto improvement constraints."""
         def objective(x):
             # Negative utility for A because we minimize in scipy.optimize
             return -self.utility_A(x[0], x[1])
+
+        def objective_jac(x):
+            return -self.utility_A_gradient(x[0], x[1])
     
         # Constraints to ensure both A and B are at least as well off as their initial endowments
         constraints = [
-            {'type': 'ineq', 'fun': lambda x: self.utility_A(x[0], x[1]) - self.utility_A(self.par.w1A, self.par.w2A)},
-            {'type': 'ineq', 'fun': lambda x: self.utility_B(1 - x[0], 1 - x[1]) - self.utility_B(1 - self.par.w1A, 1 - self.par.w2A)}
+            {'type': 'ineq', 'fun': lambda x: self.utility_A(x[0], x[1]) - self.utility_A(self.par.w1A, self.par.w2A),
+             'jac': lambda x: self.utility_A_gradient(x[0], x[1])},
+            {'type': 'ineq', 'fun': lambda x: self.utility_B(1 - x[0], 1 - x[1]) - self.utility_B(1 - self.par.w1A, 1 - self.par.w2A),
+             'jac': lambda x: -self.utility_B_gradient(1 - x[0], 1 - x[1])}
         ]
     
         # Bounds to ensure allocations are within feasible range
-        bounds = ((0, 1), (0, 1))
-    
-        # Initial guess (starting point of the optimization algorithm)
-        x0 = [self.par.w1A, self.par.w2A]
+        # (kept just inside the box, where the analytic gradients are finite)
+        bounds = ((1e-8, 1 - 1e-8), (1e-8, 1 - 1e-8))
     
         # Perform the optimization
-        result = minimize(objective, x0, method='SLSQP', bounds=bounds, constraints=constraints)
+        result = self._solve_slsqp('pareto_improvement', objective, objective_jac, bounds, constraints)
     
         if result.success:
             return result.x, -result.fun
@@ -139,21 +199,25 @@ class ExchangeEconomyClass:
         def objective(x):
             return -self.utility_A(x[0], x[1])
 
+        def objective_jac(x):
+            return -self.utility_A_gradient(x[0], x[1])
+
         # Constraint for B's utility to be at least as high as the initial utility
         def constraint(x):
             return self.utility_B(1 - x[0], 1 - x[1]) - self.utility_B(1 - self.par.w1A, 1 - self.par.w2A)
 
-        # Initial guess for the allocation
-        x0 = [self.par.w1A, self.par.w2A]
+        def constraint_jac(x):
+            return -self.utility_B_gradient(1 - x[0], 1 - x[1])
 
         # Bounds for the allocations
-        bounds = ((0, 1), (0, 1))
+        # (kept just inside the box, where the analytic gradients are finite)
+        bounds = ((1e-8, 1 - 1e-8), (1e-8, 1 - 1e-8))
 
         # Constraint dictionary
-        cons = {'type': 'ineq', 'fun': constraint}
+        cons = {'type': 'ineq', 'fun': constraint, 'jac': constraint_jac}
 
         # Solve the optimization problem
-        result = minimize(objective, x0, method='SLSQP', bounds=bounds, constraints=cons)
+        result = self._solve_slsqp('utility_unrestricted', objective, objective_jac, bounds, cons)
 
         if result.success:
             optimal_allocation = result.x
@@ -164,8 +228,29 @@ class ExchangeEconomyClass:
             print(f"Total utility: {self.utility_A(optimal_allocation[0], optimal_allocation[1]) + self.utility_B(1-optimal_allocation[0], 1-optimal_allocation[1]):.4f}")
         else:
             print("Optimization was not successful.")
-    def maximize_aggregate_utility(self):
+    def maximize_aggregate_utility(self, analytic=True):
         """Maximize the aggregate utility of consumers A and B."""
+        par = self.par
+        a, b = par.alpha, par.beta
+        if (analytic and a != b
+                and type(self).utility_A is ExchangeEconomyClass.utility_A
+                and type(self).utility_B is ExchangeEconomyClass.utility_B):
+            # The first-order conditions a*U_A/x1 = b*U_B/(1-x1) and (1-a)*U_A/x2 = (1-b)*U_B/(1-x2)
+            # give x1 = a/(a + b*lam) and x2 = (1-a)/((1-a) + (1-b)*lam) with lam = U_B/U_A.
+            # Requiring lam to be consistent with that allocation leaves
+            # (a + b*lam) / ((1-a) + (1-b)*lam) = c, which is linear in lam
+            c = (b ** b * (1 - b) ** (1 - b) / (a ** a * (1 - a) ** (1 - a))) ** (1 / (b - a))
+            denominator = b - c * (1 - b)
+            # A zero denominator, or lam <= 0, means there is no interior stationary point
+            if denominator != 0:
+                lam = (c * (1 - a) - a) / denominator
+                # The objective is concave, so an interior stationary point is the global maximum
+                if lam > 0:
+                    optimal_allocation_A = np.array([a / (a + b * lam), (1 - a) / ((1 - a) + (1 - b) * lam)])
+                    optimal_allocation_B = 1 - optimal_allocation_A
+                    return optimal_allocation_A, optimal_allocation_B, self.utility_A(*optimal_allocation_A) + self.utility_B(*optimal_allocation_B)
+
+        # Fallback: solve numerically with SLSQP
         # Define the objective function for aggregate utility
         def objective(x):
             # Calculate B's consumption based on A's consumption
@@ -173,14 +258,16 @@ class ExchangeEconomyClass:
             # Aggregate utility is the sum of A's and B's utilities
             return -(self.utility_A(x[0], x[1]) + self.utility_B(x1B, x2B))
 
-        # Initial guess for A's allocation could be their initial endowments
-        x0 = [self.par.w1A, self.par.w2A]
+        def objective_jac(x):
+            # B's allocation enters with a negative sign since x1B = 1 - x1A and x2B = 1 - x2A
+            return -(self.utility_A_gradient(x[0], x[1]) - self.utility_B_gradient(1 - x[0], 1 - x[1]))
 
         # Bounds to ensure allocations are within the feasible range
-        bounds = ((0, 1), (0, 1))
+        # (kept just inside the box, where the analytic gradients are finite)
+        bounds = ((1e-8, 1 - 1e-8), (1e-8, 1 - 1e-8))
 
         # Perform the optimization to maximize aggregate utility
-        result = minimize(objective, x0, method='SLSQP', bounds=bounds)
+        result = self._solve_slsqp('aggregate_utility', objective, objective_jac, bounds)
 
         if result.success:
             optimal_allocation_A = result.x
@@ -188,27 +275,7 @@ class ExchangeEconomyClass:
             return optimal_allocation_A, optimal_allocation_B, self.utility_A(*optimal_allocation_A) + self.utility_B(*optimal_allocation_B)
         else:
             raise ValueError("Optimization failed to maximize aggregate utility.")
-    def maximize_total_utility(self):
+    def maximize_total_utility(self, analytic=True):
         """Maximize the total utility of consumers A and B."""
-        # Define the objective function for total utility
-        def objective(x):
-            # Calculate B's consumption based on A's consumption
-            x1B, x2B = 1 - x[0], 1 - x[1]
-            # Total utility is the sum of A's and B's utilities
-            return -(self.utility_A(x[0], x[1]) + self.utility_B(x1B, x2B))
-
-        # Initial guess for A's allocation could be their initial endowments
-        x0 = [self.par.w1A, self.par.w2A]
-
-        # Bounds to ensure allocations are within the feasible range
-        bounds = ((0, 1), (0, 1))
-
-        # Perform the optimization to maximize total utility
-        result = minimize(objective, x0, method='SLSQP', bounds=bounds)
-
-        if result.success:
-            optimal_allocation_A = result.x
-            optimal_allocation_B = 1 - result.x
-            return optimal_allocation_A, optimal_allocation_B, self.utility_A(*optimal_allocation_A) + self.utility_B(*optimal_allocation_B)
-        else:
-            raise ValueError("Optimization failed to maximize total utility.")
\ No newline at end of file
+        # Total and aggregate utility are the same objective, so share one implementation
+        return self.maximize_aggregate_utility(analytic=analytic)